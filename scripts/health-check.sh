@@ -44,6 +44,17 @@ if [ $RETRY_COUNT -eq $MAX_RETRIES ]; then
     exit 1
 fi
 
+# Check readiness (Synology, session and Telegram checks)
+if command -v curl > /dev/null; then
+    if READYZ=$(curl -fsS "http://localhost:$PORT/readyz" 2>&1); then
+        echo -e "${GREEN}✓ Service is ready${NC}"
+    else
+        echo -e "${YELLOW}⚠ Service is not ready${NC}"
+        curl -sS "http://localhost:$PORT/readyz" || echo "$READYZ"
+        echo ""
+    fi
+fi
+
 # Check container logs for errors
 echo -e "${YELLOW}Checking logs for errors...${NC}"
 if docker logs $CONTAINER_NAME 2>&1 | grep -i "error" > /dev/null; then
@@ -0,0 +1,455 @@
+"""
+Asyncio serving mode for Synology Surveillance Station to Telegram bridge
+
+Serves the same /webhookcam webhook as main.py from a single aiohttp
+process. Synology requests, Telegram uploads and clip file I/O are all
+non-blocking, so one process can handle hundreds of concurrent motion jobs.
+Camera config and motion tracking are shared with the sync mode through
+the cameras module.
+
+Run with:
+    python async_main.py
+or:
+    gunicorn --bind 0.0.0.0:7878 --workers 1 \\
+        --worker-class aiohttp.GunicornWebWorker async_main:app
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+# Import configuration
+from config import (
+    setup_logger,
+    REQUIRED_ENV_VARS,
+    TELEGRAM_CHAT_ID,
+    TELEGRAM_TOKEN,
+    SYNOLOGY_URL,
+    SYNOLOGY_LOGIN,
+    SYNOLOGY_PASSWORD,
+    SYNOLOGY_OTP,
+    CONFIG_FILE,
+    VIDEO_FILE,
+    VIDEO_SEGMENT_DURATION,
+    WEBHOOK_TIMEOUT,
+    API_TIMEOUT,
+    CLIP_CACHE_DIR,
+    CLIP_CACHE_MAX_BYTES,
+    DEPENDENCIES,
+)
+
+# Import utilities
+from utils import ensure_module_installed, validate_required_env, job_video_file
+from clip_cache import ClipCache
+from cameras import (
+    SID_KEY,
+    build_cam_config,
+    load_cam_config,
+    save_cam_config,
+    init_tracking,
+    next_segment,
+)
+
+# Setup logger
+log = setup_logger(__name__)
+
+# Auto-install required modules
+ensure_module_installed("telebot", DEPENDENCIES["telebot"])
+aiohttp = ensure_module_installed("aiohttp", DEPENDENCIES["aiohttp"])
+aiofiles = ensure_module_installed("aiofiles", DEPENDENCIES["aiofiles"])
+
+from aiohttp import web
+from telebot.async_telebot import AsyncTeleBot
+
+# ============================================================================
+# VALIDATION AND INITIALIZATION
+# ============================================================================
+
+# Validate environment
+validate_required_env(REQUIRED_ENV_VARS, log)
+
+# Initialize Telegram bot
+chat_id = TELEGRAM_CHAT_ID
+tg_bot = AsyncTeleBot(TELEGRAM_TOKEN)
+log.info(f"Async Telegram bot initialized for chat {chat_id}")
+
+# Initialize Synology configuration
+syno_url = SYNOLOGY_URL
+config_file = CONFIG_FILE
+
+# Camera movement tracking, filled in on startup
+arr_cam_move = {}
+cam_load = {}
+cam_locks = {}
+syno_sid = None
+http_session = None
+
+# Cache of sent clips, shared with the sync mode
+clip_cache = ClipCache(CLIP_CACHE_DIR, CLIP_CACHE_MAX_BYTES)
+
+
+async def syno_get_json(params):
+    """Send a request to the Synology API and return the decoded response
+
+    Args:
+        params (dict): Query parameters
+
+    Returns:
+        dict: Decoded JSON response
+
+    Raises:
+        aiohttp.ClientError: If the request fails
+    """
+    async with http_session.get(syno_url, params=params) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+# Send Telegram message
+async def send_cammessage(message):
+    """Send a text message to the configured Telegram chat
+
+    Args:
+        message (str): Message text to send
+
+    Returns:
+        None
+    """
+    try:
+        await tg_bot.send_message(chat_id, message)
+        log.debug(f"Message sent to Telegram: {message[:50]}...")
+    except Exception as e:
+        log.error(f"Failed to send message to Telegram: {e}")
+
+
+async def send_camvideo(videofile, cam_id):
+    """Send video to Telegram chat with camera name as caption
+
+    Args:
+        videofile (str): Path to the video file to send
+        cam_id (str): Camera ID for looking up camera name
+
+    Returns:
+        str: Telegram file_id of the uploaded video, None if failed
+    """
+    try:
+        mycaption = f"Camera: {cam_load[cam_id]['SynoName']}"
+        # aiohttp streams an open file in chunks, reading it in an executor,
+        # so the clip is never held in memory as a whole
+        with open(videofile, "rb") as video:
+            sent = await tg_bot.send_video(chat_id, video, caption=mycaption)
+        log.info(f"Video sent to Telegram for camera {cam_id}")
+        return sent.video.file_id if sent and sent.video else None
+    except FileNotFoundError:
+        log.error(f"Video file not found: {videofile}")
+    except KeyError:
+        log.error(f"Camera {cam_id} not found in configuration")
+    except Exception as e:
+        log.error(f"Failed to send video to Telegram: {e}")
+    return None
+
+
+async def first_start():
+    """Authenticate with Synology, fetch camera configuration and save it
+
+    Returns:
+        dict: Camera config
+
+    Raises:
+        SystemExit: If authentication or configuration fetch fails
+    """
+    try:
+        log.info("Starting Synology authentication...")
+
+        auth_params = {
+            "api": "SYNO.API.Auth",
+            "version": "7",
+            "method": "login",
+            "account": SYNOLOGY_LOGIN,
+            "passwd": SYNOLOGY_PASSWORD,
+            "session": "SurveillanceStation",
+            "format": "cookie12",
+        }
+        if SYNOLOGY_OTP:
+            auth_params["otp_code"] = SYNOLOGY_OTP
+            log.info("Using two-factor authentication (OTP)")
+
+        auth_data = await syno_get_json(auth_params)
+        if not auth_data.get("success"):
+            log.error(
+                f'Authentication failed: {auth_data.get("error", "Unknown error")}'
+            )
+            sys.exit(1)
+
+        sid = auth_data["data"]["sid"]
+        log.info(f"Successfully authenticated with Synology (SID: {sid[:20]}...)")
+
+        cameras_data = await syno_get_json(
+            {
+                "api": "SYNO.SurveillanceStation.Camera",
+                "_sid": sid,
+                "version": "9",
+                "method": "List",
+            }
+        )
+        if not cameras_data.get("success"):
+            log.error(
+                f'Failed to get cameras: {cameras_data.get("error", "Unknown error")}'
+            )
+            sys.exit(1)
+
+        cameras = cameras_data.get("data", {}).get("cameras", [])
+        log.info(f"Found {len(cameras)} camera(s)")
+
+        data, cam_conf_text = build_cam_config(cameras, sid)
+        save_cam_config(config_file, data)
+
+        await send_cammessage(f"✅ Cameras config loaded:\n{cam_conf_text}")
+        return data
+
+    except asyncio.TimeoutError:
+        log.error(f"Request timeout to Synology ({API_TIMEOUT}s)")
+        sys.exit(1)
+    except aiohttp.ClientError as e:
+        log.error(f"Failed to communicate with Synology: {e}")
+        sys.exit(1)
+    except (KeyError, json.JSONDecodeError) as e:
+        log.error(f"Failed to parse Synology response: {e}")
+        sys.exit(1)
+    except IOError as e:
+        log.error(f"Failed to write configuration file: {e}")
+        sys.exit(1)
+
+
+async def get_last_id_video(cam_id):
+    """Get the last (most recent) video ID for a camera from Synology
+
+    Args:
+        cam_id (str): Camera ID from configuration
+
+    Returns:
+        str: Video ID if successful, None if failed
+    """
+    try:
+        data = await syno_get_json(
+            {
+                "version": "6",
+                "cameraIds": cam_id,
+                "api": "SYNO.SurveillanceStation.Recording",
+                "toTime": "0",
+                "offset": "0",
+                "limit": "1",
+                "fromTime": "0",
+                "method": "List",
+                "_sid": syno_sid,
+            }
+        )
+        take_video_id = data["data"]["recordings"][0]["id"]
+        log.debug(f"Got video ID for camera {cam_id}: {take_video_id}")
+        return take_video_id
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.error(f"Failed to get video ID for camera {cam_id}: {e}")
+        return None
+    except (KeyError, IndexError, json.JSONDecodeError) as e:
+        log.error(f"Failed to parse video response for camera {cam_id}: {e}")
+        return None
+
+
+async def get_last_video(video_id, offset, video_file):
+    """Download a video segment from Synology and stream it to a file
+
+    Args:
+        video_id (str): Video ID from Synology
+        offset (str): Offset in milliseconds for segmented playback
+        video_file (str): Path where the video segment is saved
+
+    Returns:
+        bool: True if successful, False if failed
+    """
+    params = {
+        "id": video_id,
+        "version": "6",
+        "mountId": "0",
+        "api": "SYNO.SurveillanceStation.Recording",
+        "method": "Download",
+        "offsetTimeMs": offset,
+        "playTimeMs": VIDEO_SEGMENT_DURATION,
+        "_sid": syno_sid,
+    }
+    try:
+        async with http_session.get(syno_url + "/temp.mp4", params=params) as response:
+            response.raise_for_status()
+            async with aiofiles.open(video_file, "wb") as f:
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    await f.write(chunk)
+
+        log.debug(f"Video downloaded to {video_file} (offset: {offset}ms)")
+        return True
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.error(f"Failed to download video: {e}")
+        return False
+    except IOError as e:
+        log.error(f"Failed to write video file: {e}")
+        return False
+
+
+# ============================================================================
+# ROUTES
+# ============================================================================
+
+
+async def webhookcam(request):
+    """Handle webhook from Synology Surveillance Station motion detection
+
+    Expected JSON payload:
+    {
+        "idcam": "1"
+    }
+
+    Returns:
+        web.Response: 'success' on success, or appropriate error code
+    """
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        payload = None
+
+    # Validate input
+    if not isinstance(payload, dict) or "idcam" not in payload:
+        log.error("Invalid webhook: missing idcam")
+        raise web.HTTPBadRequest()
+
+    cam_id = payload["idcam"]
+
+    # Validate camera ID exists in config and is tracked
+    if cam_id not in cam_load:
+        log.error(f"Received webhook for unknown camera: {cam_id}")
+        raise web.HTTPBadRequest()
+    if cam_id not in arr_cam_move:
+        log.error(f"Camera {cam_id} not in tracking list")
+        raise web.HTTPBadRequest()
+
+    log.info(
+        f"Received motion detection from camera {cam_id} at {time.strftime('%d.%m.%Y %H:%M:%S', time.localtime())}"
+    )
+    await asyncio.sleep(WEBHOOK_TIMEOUT)  # Wait before fetching video
+
+    try:
+        # Jobs of the same camera run one at a time to keep segments in order
+        async with cam_locks[cam_id]:
+            last_video_id = await get_last_id_video(cam_id)
+            if last_video_id is None:
+                log.error(f"Failed to get video for camera {cam_id}")
+                raise web.HTTPInternalServerError()
+
+            # New motion starts from the beginning with pre-recording,
+            # continuous motion gets the next segment
+            offset, new_motion = next_segment(
+                arr_cam_move, cam_id, last_video_id, VIDEO_SEGMENT_DURATION
+            )
+            with job_video_file(VIDEO_FILE) as video_file:
+                downloaded = await get_last_video(
+                    last_video_id, str(offset), video_file
+                )
+                if new_motion:
+                    mycaption = f"🔴 Motion detected: {cam_load[cam_id]['SynoName']}"
+                    await send_cammessage(mycaption)
+
+                # Send video to Telegram and keep it for bot commands
+                if downloaded:
+                    file_id = await send_camvideo(video_file, cam_id)
+                    await asyncio.to_thread(
+                        clip_cache.put,
+                        cam_id,
+                        last_video_id,
+                        offset,
+                        video_file,
+                        file_id,
+                    )
+                else:
+                    log.error(f"No video to send for camera {cam_id}")
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Webhook error: {e}")
+        raise web.HTTPInternalServerError()
+
+    log.debug(f"Webhook processed successfully for camera {cam_id}")
+    return web.Response(text="success")
+
+
+async def health(request):
+    """Health check endpoint
+
+    Returns:
+        web.Response: Status information
+    """
+    return web.json_response(
+        {
+            "status": "healthy",
+            "timestamp": time.strftime("%d.%m.%Y %H:%M:%S", time.localtime()),
+            "cameras": len(arr_cam_move),
+        }
+    )
+
+
+async def livez(request):
+    """Liveness probe - the event loop serves requests
+
+    Returns:
+        web.Response: Status information
+    """
+    return web.json_response({"status": "alive"})
+
+
+# ============================================================================
+# APPLICATION STARTUP
+# ============================================================================
+
+
+async def on_startup(app):
+    """Open the HTTP session, load camera config and initialize tracking"""
+    global http_session, cam_load, arr_cam_move, cam_locks, syno_sid
+
+    http_session = aiohttp.ClientSession(
+        # Like requests' timeout in the sync mode: limit connect and each read,
+        # not the whole (possibly long) Recording Download
+        timeout=aiohttp.ClientTimeout(
+            total=None, sock_connect=API_TIMEOUT, sock_read=API_TIMEOUT
+        )
+    )
+
+    cam_load = load_cam_config(config_file)
+    if cam_load is None:
+        log.info("Not Found Syno config, need create")
+        cam_load = await first_start()
+    syno_sid = cam_load[SID_KEY]
+
+    arr_cam_move = init_tracking(cam_load)
+    cam_locks = {cam_id: asyncio.Lock() for cam_id in arr_cam_move}
+    log.info(f"Tracking {len(arr_cam_move)} camera(s)")
+
+
+async def on_cleanup(app):
+    """Close the HTTP sessions of the Synology and Telegram clients"""
+    await http_session.close()
+    await tg_bot.close_session()
+
+
+app = web.Application()
+app.router.add_post("/webhookcam", webhookcam)
+app.router.add_get("/health", health)
+app.router.add_get("/livez", livez)
+app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
+
+
+if __name__ == "__main__":
+    log.info("=" * 70)
+    log.info("Starting Synology Surveillance Station to Telegram Bridge (asyncio)")
+    log.info("=" * 70)
+    log.info(f"Webhook URL: http://<your-host>:7878/webhookcam")
+    log.info(f"Health check: http://<your-host>:7878/health")
+
+    web.run_app(app, host="0.0.0.0", port=7878)
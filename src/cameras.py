@@ -0,0 +1,130 @@
+"""
+Camera configuration and motion tracking for Synology Surveillance Station to Telegram bridge
+
+This module holds the camera config and per-camera segment tracking logic
+shared by the sync (Flask) and async (aiohttp) serving modes.
+"""
+
+import json
+import pathlib
+
+from config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Key of the Synology session ID stored next to the cameras in the config file
+SID_KEY = "SynologyAuthSid"
+
+
+def build_cam_config(cameras, sid):
+    """Build the camera config from a Synology camera list
+
+    Args:
+        cameras (list): Cameras from SYNO.SurveillanceStation.Camera List
+        sid (str): Synology session ID
+
+    Returns:
+        tuple: (config dict, human readable camera list for Telegram)
+    """
+    data = {}
+    cam_conf_text = ""
+
+    for camera in cameras:
+        # Synology returns numeric IDs, webhooks and the saved JSON use strings
+        cam_id = str(camera["id"])
+        data[cam_id] = {
+            "CamId": camera["id"],
+            "IP": camera.get("ip", "N/A"),
+            "SynoName": camera.get("newName", "Unknown"),
+            "Model": camera.get("model", "N/A"),
+            "Vendor": camera.get("vendor", "N/A"),
+        }
+        cam_conf_text += (
+            f"CamId: {cam_id} "
+            f"IP: {camera.get('ip', 'N/A')} "
+            f"SynoName: {camera.get('newName', 'Unknown')} "
+            f"Model: {camera.get('model', 'N/A')} "
+            f"Vendor: {camera.get('vendor', 'N/A')}\n"
+        )
+
+    data[SID_KEY] = sid
+    return data, cam_conf_text
+
+
+def load_cam_config(config_file):
+    """Load the camera config from file
+
+    Args:
+        config_file (str): Path to the camera config JSON file
+
+    Returns:
+        dict: Camera config, or None if the file is missing, empty or invalid
+    """
+    path = pathlib.Path(config_file)
+    if not path.is_file() or path.stat().st_size == 0:
+        return None
+    try:
+        with open(config_file) as f:
+            cam_load = json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to load configuration: {e}")
+        return None
+    if not cam_load.get(SID_KEY):
+        logger.warning(f"{SID_KEY} not found in config")
+        return None
+    return cam_load
+
+
+def save_cam_config(config_file, data):
+    """Save the camera config to file
+
+    Args:
+        config_file (str): Path to the camera config JSON file
+        data (dict): Camera config
+
+    Raises:
+        IOError: If the file cannot be written
+    """
+    with open(config_file, "w") as f:
+        json.dump(data, f, indent=2)
+    logger.info(f"Configuration saved to {config_file}")
+
+
+def init_tracking(cam_load):
+    """Create the motion tracking state for every configured camera
+
+    Args:
+        cam_load (dict): Camera config
+
+    Returns:
+        dict: Camera ID -> last seen video ID and current segment offset
+    """
+    return {
+        cam_id: {"old_last_video_id": "0", "video_offset": 0}
+        for cam_id in cam_load
+        if cam_id != SID_KEY
+    }
+
+
+def next_segment(arr_cam_move, cam_id, last_video_id, segment_duration):
+    """Advance the tracking state of a camera to the segment to send
+
+    A new recording starts from offset 0 to include the pre-recording, a
+    recording already seen continues with the next segment.
+
+    Args:
+        arr_cam_move (dict): Tracking state from init_tracking
+        cam_id (str): Camera ID from configuration
+        last_video_id (str): Most recent video ID of the camera
+        segment_duration (int): Segment duration in milliseconds
+
+    Returns:
+        tuple: (offset in milliseconds, True if this is a new motion event)
+    """
+    state = arr_cam_move[cam_id]
+    if last_video_id != state["old_last_video_id"]:
+        state["old_last_video_id"] = last_video_id
+        state["video_offset"] = 0
+        return 0, True
+    state["video_offset"] = int(state["video_offset"]) + segment_duration
+    return state["video_offset"], False
@@ -0,0 +1,212 @@
+"""
+Clip cache for Synology Surveillance Station to Telegram bridge
+
+This module keeps already downloaded video segments on disk so they can be
+sent again without another Recording Download from Synology. Each clip is
+keyed by (camera id, recording id, offset) and remembers the Telegram
+file_id of its upload, which lets the bot resend it without re-uploading.
+The cache is bounded by total size in bytes and evicts the least recently
+used clips first.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import time
+
+from config import setup_logger
+
+logger = setup_logger(__name__)
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".index.lock"
+
+
+class ClipCache:
+    """Disk-backed LRU cache of video clips
+
+    The index is stored as JSON next to the clips and guarded by a file lock,
+    so several gunicorn workers can share the same cache directory.
+
+    Args:
+        cache_dir (str): Directory where clips and the index are stored
+        max_bytes (int): Maximum total size of cached clips in bytes
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.lock_path = os.path.join(cache_dir, LOCK_FILE)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(cam_id, recording_id, offset):
+        """Build the cache key for a clip
+
+        Args:
+            cam_id (str): Camera ID from configuration
+            recording_id (str): Recording ID from Synology
+            offset (int | str): Offset in milliseconds inside the recording
+
+        Returns:
+            str: Cache key
+        """
+        return f"{cam_id}_{recording_id}_{int(offset)}"
+
+    @contextlib.contextmanager
+    def _locked_index(self):
+        """Lock the index and yield it, saving it back on exit"""
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                self._write_index(index)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (IOError, json.JSONDecodeError) as e:
+            logger.warning(f"Clip cache index is unreadable, starting empty: {e}")
+            return {}
+
+    def _write_index(self, index):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _clip_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def _evict(self, index):
+        """Remove least recently used clips until the cache fits in max_bytes"""
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            entry = index.pop(key)
+            total -= entry["size"]
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(entry["file"])
+            logger.debug(f"Evicted clip {key} from cache ({entry['size']} bytes)")
+
+    def get(self, cam_id, recording_id, offset):
+        """Look up a clip and mark it as recently used
+
+        Args:
+            cam_id (str): Camera ID from configuration
+            recording_id (str): Recording ID from Synology
+            offset (int | str): Offset in milliseconds inside the recording
+
+        Returns:
+            dict: Cache entry, or None if the clip is not cached
+        """
+        key = self.make_key(cam_id, recording_id, offset)
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if not entry.get("file_id") and not os.path.isfile(entry["file"]):
+                index.pop(key)
+                return None
+            entry["last_used"] = time.time()
+            return dict(entry)
+
+    @staticmethod
+    def _recording_order(entry):
+        """Sort key placing later recordings and later segments last"""
+        recording_id = entry["recording_id"]
+        return (
+            int(recording_id) if recording_id.isdigit() else -1,
+            entry["offset"],
+        )
+
+    def latest(self, cam_id):
+        """Return the cached clip with the newest footage of a camera
+
+        Clips are ordered by recording ID and offset, not by caching time,
+        so an older clip fetched on request never counts as the latest.
+
+        Args:
+            cam_id (str): Camera ID from configuration
+
+        Returns:
+            dict: Cache entry, or None if nothing is cached for the camera
+        """
+        with self._locked_index() as index:
+            entries = [e for e in index.values() if e["cam_id"] == str(cam_id)]
+            if not entries:
+                return None
+            entry = max(entries, key=self._recording_order)
+            entry["last_used"] = time.time()
+            return dict(entry)
+
+    def put(self, cam_id, recording_id, offset, video_file, file_id=None):
+        """Copy a downloaded clip into the cache
+
+        Args:
+            cam_id (str): Camera ID from configuration
+            recording_id (str): Recording ID from Synology
+            offset (int | str): Offset in milliseconds inside the recording
+            video_file (str): Path to the downloaded clip
+            file_id (str): Telegram file_id of the uploaded clip, if known
+
+        Returns:
+            dict: Cache entry, or None if the clip could not be stored
+        """
+        key = self.make_key(cam_id, recording_id, offset)
+        clip_path = self._clip_path(key)
+        try:
+            if os.path.getsize(video_file) > self.max_bytes:
+                logger.warning(f"Clip {key} is larger than the cache, not cached")
+                return None
+            shutil.copyfile(video_file, clip_path)
+            size = os.path.getsize(clip_path)
+        except IOError as e:
+            logger.error(f"Failed to store clip {key} in cache: {e}")
+            return None
+
+        now = time.time()
+        entry = {
+            "cam_id": str(cam_id),
+            "recording_id": str(recording_id),
+            "offset": int(offset),
+            "file": clip_path,
+            "size": size,
+            "file_id": file_id,
+            "created": now,
+            "last_used": now,
+        }
+        with self._locked_index() as index:
+            index[key] = entry
+            self._evict(index)
+            if key not in index:
+                return None
+        logger.debug(f"Cached clip {key} ({size} bytes)")
+        return dict(entry)
+
+    def set_file_id(self, cam_id, recording_id, offset, file_id):
+        """Remember the Telegram file_id of a cached clip
+
+        Args:
+            cam_id (str): Camera ID from configuration
+            recording_id (str): Recording ID from Synology
+            offset (int | str): Offset in milliseconds inside the recording
+            file_id (str): Telegram file_id of the uploaded clip
+
+        Returns:
+            None
+        """
+        key = self.make_key(cam_id, recording_id, offset)
+        with self._locked_index() as index:
+            if key in index:
+                index[key]["file_id"] = file_id
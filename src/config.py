@@ -56,6 +56,11 @@ OPTIONAL_ENV_VARS = {
     "API_TIMEOUT": 30,  # seconds - timeout for API requests
     "GUNICORN_WORKERS": 2,  # Number of worker processes
     "GUNICORN_TIMEOUT": 120,  # seconds
+    "CLIP_CACHE_DIR": "/bot/clips",  # Sent clips cache directory
+    "CLIP_CACHE_MAX_MB": 500,  # megabytes - LRU eviction above this size
+    "BOT_COMMANDS": 1,  # 1 to answer /last and /clip commands, 0 to disable
+    "HEALTH_PROBE_INTERVAL": 10,  # seconds between readiness probes
+    "HEALTH_PROBE_TIMEOUT": 5,  # seconds - timeout for a single probe request
 }
 
 
@@ -117,6 +122,7 @@ SYNOLOGY_API = {
 
 CONFIG_FILE = os.environ.get("CONFIG_FILE", OPTIONAL_ENV_VARS["CONFIG_FILE"])
 VIDEO_FILE = os.environ.get("VIDEO_FILE", OPTIONAL_ENV_VARS["VIDEO_FILE"])
+CLIP_CACHE_DIR = os.environ.get("CLIP_CACHE_DIR", OPTIONAL_ENV_VARS["CLIP_CACHE_DIR"])
 
 
 # ============================================================================
@@ -138,6 +144,26 @@ API_TIMEOUT = int(
 )  # seconds - timeout for requests
 
 
+CLIP_CACHE_MAX_BYTES = (
+    int(os.environ.get("CLIP_CACHE_MAX_MB", OPTIONAL_ENV_VARS["CLIP_CACHE_MAX_MB"]))
+    * 1024
+    * 1024
+)  # bytes - total size of cached clips before eviction
+
+BOT_COMMANDS = (
+    int(os.environ.get("BOT_COMMANDS", OPTIONAL_ENV_VARS["BOT_COMMANDS"])) == 1
+)  # answer /last and /clip commands in the Telegram chat
+
+
+HEALTH_PROBE_INTERVAL = int(
+    os.environ.get("HEALTH_PROBE_INTERVAL", OPTIONAL_ENV_VARS["HEALTH_PROBE_INTERVAL"])
+)  # seconds between readiness probes
+
+HEALTH_PROBE_TIMEOUT = int(
+    os.environ.get("HEALTH_PROBE_TIMEOUT", OPTIONAL_ENV_VARS["HEALTH_PROBE_TIMEOUT"])
+)  # seconds - timeout for a single probe request
+
+
 # ============================================================================
 # GUNICORN CONFIGURATION
 # ============================================================================
@@ -159,4 +185,6 @@ DEPENDENCIES = {
     "telebot": "pyTelegramBotAPI",
     "flask": "flask",
     "requests": "requests",
+    "aiohttp": "aiohttp",  # async serving mode only
+    "aiofiles": "aiofiles",  # async serving mode only
 }
@@ -0,0 +1,128 @@
+"""
+Health probing for Synology Surveillance Station to Telegram bridge
+
+This module runs dependency checks (Synology, Telegram) in a background
+thread and caches their results, so the /livez and /readyz endpoints only
+read memory and never make an upstream call themselves.
+"""
+
+import threading
+import time
+
+from config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class HealthProber:
+    """Background prober with cached check results
+
+    Each check is a callable that returns a short detail string on success
+    and raises an exception on failure. Every check runs in its own thread,
+    so a slow dependency never delays the others. A check still running
+    after ``timeout`` seconds, or a result older than ``max_age`` seconds,
+    counts as failed.
+
+    Args:
+        checks (dict): Check name -> callable
+        interval (int): Seconds between runs of each check
+        timeout (int): Seconds after which a running check counts as failed
+        max_age (int): Seconds after which a cached result is stale
+    """
+
+    def __init__(self, checks, interval, timeout, max_age):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = max_age
+        self._results = {}
+        self._running = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start one background probe thread per check
+
+        Returns:
+            None
+        """
+        for name in self.checks:
+            thread = threading.Thread(target=self._run, args=(name,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(
+            f"Health prober started for {', '.join(self.checks)} "
+            f"(every {self.interval}s)"
+        )
+
+    def is_alive(self):
+        """Check that every probe thread is still running
+
+        Returns:
+            bool: True if all probe threads are alive
+        """
+        return bool(self._threads) and all(t.is_alive() for t in self._threads)
+
+    def _run(self, name):
+        while True:
+            self.probe(name)
+            time.sleep(self.interval)
+
+    def probe(self, name):
+        """Run one check and cache its result
+
+        Args:
+            name (str): Check name
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._running[name] = time.time()
+        try:
+            detail = self.checks[name]()
+            ok = True
+        except Exception as e:
+            detail = str(e)
+            ok = False
+        if not ok:
+            logger.warning(f"Health check {name} failed: {detail}")
+        with self._lock:
+            self._running.pop(name, None)
+            self._results[name] = {
+                "ok": ok,
+                "detail": detail,
+                "checked_at": time.time(),
+            }
+
+    def status(self):
+        """Return the cached result of every check
+
+        Returns:
+            tuple: (ready, results) where ready is True only if every check
+                   has a fresh successful result
+        """
+        now = time.time()
+        results = {}
+        with self._lock:
+            cached = dict(self._results)
+            running = dict(self._running)
+        for name in self.checks:
+            started_at = running.get(name)
+            if started_at is not None and now - started_at > self.timeout:
+                results[name] = {
+                    "ok": False,
+                    "detail": f"no answer after {self.timeout}s",
+                    "age": round(now - started_at, 1),
+                }
+                continue
+            result = cached.get(name)
+            if result is None:
+                results[name] = {"ok": False, "detail": "not checked yet", "age": None}
+                continue
+            age = round(now - result["checked_at"], 1)
+            ok = result["ok"] and age <= self.max_age
+            detail = result["detail"] if age <= self.max_age else "result is stale"
+            results[name] = {"ok": ok, "detail": detail, "age": age}
+        ready = all(result["ok"] for result in results.values())
+        return ready, results
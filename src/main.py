@@ -1,9 +1,10 @@
-import pathlib
 import time
 import os
 import json
 import sys
 import logging
+import fcntl
+import threading
 
 # Import configuration
 from config import (
@@ -22,11 +23,26 @@ from config import (
     VIDEO_SEGMENT_DURATION,
     WEBHOOK_TIMEOUT,
     API_TIMEOUT,
+    CLIP_CACHE_DIR,
+    CLIP_CACHE_MAX_BYTES,
+    BOT_COMMANDS,
+    HEALTH_PROBE_INTERVAL,
+    HEALTH_PROBE_TIMEOUT,
     DEPENDENCIES,
 )
 
 # Import utilities
-from utils import ensure_module_installed
+from utils import ensure_module_installed, validate_required_env, job_video_file
+from clip_cache import ClipCache
+from cameras import (
+    SID_KEY,
+    build_cam_config,
+    load_cam_config,
+    save_cam_config,
+    init_tracking,
+    next_segment,
+)
+from health import HealthProber
 
 # Setup logger
 log = setup_logger(__name__)
@@ -46,23 +62,8 @@ abort = flask_module.abort
 # ============================================================================
 
 
-def validate_required_env():
-    """Validate that all required environment variables are set"""
-    missing = []
-    for var_name in REQUIRED_ENV_VARS:
-        if var_name not in os.environ:
-            missing.append(var_name)
-
-    if missing:
-        for var in missing:
-            log.error(f"{var} does not exist. Please configure environment")
-        sys.exit(1)
-
-    log.info(f"All required environment variables are set")
-
-
 # Validate environment
-validate_required_env()
+validate_required_env(REQUIRED_ENV_VARS, log)
 
 # Initialize Telegram bot
 chat_id = TELEGRAM_CHAT_ID
@@ -82,6 +83,10 @@ arr_cam_move = {}
 cam_load = {}
 syno_sid = None
 
+# Cache of sent clips, reused by the /last and /clip bot commands
+clip_cache = ClipCache(CLIP_CACHE_DIR, CLIP_CACHE_MAX_BYTES)
+bot_polling_lock = None
+
 
 # Send Telegram message
 def send_cammessage(message):
@@ -108,22 +113,43 @@ def send_camvideo(videofile, cam_id):
         cam_id (str): Camera ID for looking up camera name
 
     Returns:
-        None
-
-    Raises:
-        KeyError: If camera_id not found in cam_load
+        str: Telegram file_id of the uploaded video, None if failed
     """
     try:
         mycaption = f"Camera: {cam_load[cam_id]['SynoName']}"
         with open(videofile, "rb") as video:
-            tg_bot.send_video(chat_id, video, None, None, None, None, mycaption)
+            sent = tg_bot.send_video(chat_id, video, None, None, None, None, mycaption)
         log.info(f"Video sent to Telegram for camera {cam_id}")
+        return sent.video.file_id if sent and sent.video else None
     except FileNotFoundError:
         log.error(f"Video file not found: {videofile}")
     except KeyError:
         log.error(f"Camera {cam_id} not found in configuration")
     except Exception as e:
         log.error(f"Failed to send video to Telegram: {e}")
+    return None
+
+
+def resend_camvideo(file_id, cam_id):
+    """Send an already uploaded video to Telegram by its file_id
+
+    Args:
+        file_id (str): Telegram file_id of a previously uploaded video
+        cam_id (str): Camera ID for looking up camera name
+
+    Returns:
+        bool: True if successful, False if failed
+    """
+    try:
+        mycaption = f"Camera: {cam_load[cam_id]['SynoName']}"
+        tg_bot.send_video(chat_id, file_id, None, None, None, None, mycaption)
+        log.info(f"Cached video resent to Telegram for camera {cam_id}")
+        return True
+    except KeyError:
+        log.error(f"Camera {cam_id} not found in configuration")
+    except Exception as e:
+        log.error(f"Failed to resend cached video to Telegram: {e}")
+    return False
 
 
 def firstStart():
@@ -197,33 +223,11 @@ def firstStart():
         log.info(f"Found {len(cameras)} camera(s)")
 
         # Build config from camera list
-        data = {}
-        cam_conf_text = ""
-
-        for camera in cameras:
-            cam_id = camera["id"]
-            data[cam_id] = {
-                "CamId": cam_id,
-                "IP": camera.get("ip", "N/A"),
-                "SynoName": camera.get("newName", "Unknown"),
-                "Model": camera.get("model", "N/A"),
-                "Vendor": camera.get("vendor", "N/A"),
-            }
-            cam_conf_text += (
-                f"CamId: {cam_id} "
-                f"IP: {camera.get('ip', 'N/A')} "
-                f"SynoName: {camera.get('newName', 'Unknown')} "
-                f"Model: {camera.get('model', 'N/A')} "
-                f"Vendor: {camera.get('vendor', 'N/A')}\n"
-            )
-
-        data["SynologyAuthSid"] = sid
+        data, cam_conf_text = build_cam_config(cameras, sid)
         cam_load = data
 
         # Save config to file
-        with open(config_file, "w") as f:
-            json.dump(data, f, indent=2)
-        log.info(f"Configuration saved to {config_file}")
+        save_cam_config(config_file, data)
 
         # Send confirmation to Telegram
         mycaption = f"✅ Cameras config loaded:\n{cam_conf_text}"
@@ -243,25 +247,20 @@ def firstStart():
         sys.exit(1)
 
 
-if not pathlib.Path(config_file).is_file():
+cam_load = load_cam_config(config_file)
+if cam_load is None:
     log.info("Not Found Syno config, need create")
     firstStart()
+    cam_load = load_cam_config(config_file)
 
-if pathlib.Path(config_file).stat().st_size == 0:
-    log.info("Syno config is empty.")
-    firstStart()
-
-if pathlib.Path(config_file).stat().st_size == 0:
+if cam_load is None:
     log.info("Syno config always is empty. Exit.")
     sys.exit()
 
-with open(config_file) as f:
-    cam_load = json.load(f)
-syno_sid = cam_load["SynologyAuthSid"]
+syno_sid = cam_load[SID_KEY]
+log.info(f"Loaded configuration with {len(cam_load) - 1} camera(s)")
 
-for i in cam_load:
-    arr_cam_move[i] = {"old_last_video_id": "0", "video_offset": "0"}
-del arr_cam_move["SynologyAuthSid"]
+arr_cam_move = init_tracking(cam_load)
 
 
 def get_last_id_video(cam_id):
@@ -304,12 +303,60 @@ def get_last_id_video(cam_id):
         return None
 
 
-def get_last_video(video_id, offset):
+def get_recording_at(cam_id, timestamp):
+    """Find the recording of a camera that covers a point in time
+
+    Args:
+        cam_id (str): Camera ID from configuration
+        timestamp (int): Unix time in seconds
+
+    Returns:
+        tuple: (video ID, offset in milliseconds aligned to the segment
+               duration), or None if no recording covers the timestamp
+    """
+    try:
+        response = requests.get(
+            syno_url,
+            params={
+                "version": "6",
+                "cameraIds": cam_id,
+                "api": "SYNO.SurveillanceStation.Recording",
+                "toTime": str(timestamp),
+                "offset": "0",
+                "limit": "1",
+                "fromTime": "0",
+                "method": "List",
+                "_sid": syno_sid,
+            },
+            timeout=API_TIMEOUT,
+        )
+        response.raise_for_status()
+        recordings = response.json()["data"]["recordings"]
+        if not recordings:
+            return None
+        recording = recordings[0]
+        start_time = int(recording["startTime"])
+        stop_time = int(recording.get("stopTime") or 0)
+        if timestamp < start_time or (stop_time and timestamp > stop_time):
+            return None
+        offset = (timestamp - start_time) * 1000
+        offset -= offset % VIDEO_SEGMENT_DURATION
+        return recording["id"], offset
+    except requests.exceptions.RequestException as e:
+        log.error(f"Failed to get recording for camera {cam_id}: {e}")
+        return None
+    except (KeyError, IndexError, ValueError) as e:
+        log.error(f"Failed to parse recording response for camera {cam_id}: {e}")
+        return None
+
+
+def get_last_video(video_id, offset, video_file=VIDEO_FILE):
     """Download a video segment from Synology and save to temporary file
 
     Args:
         video_id (str): Video ID from Synology
         offset (str): Offset in milliseconds for segmented playback
+        video_file (str): Path where the video segment is saved
 
     Returns:
         bool: True if successful, False if failed
@@ -332,10 +379,10 @@ def get_last_video(video_id, offset):
         )
         response.raise_for_status()
 
-        with open(VIDEO_FILE, "wb") as f:
+        with open(video_file, "wb") as f:
             f.write(response.content)
 
-        log.debug(f"Video downloaded to {VIDEO_FILE} (offset: {offset}ms)")
+        log.debug(f"Video downloaded to {video_file} (offset: {offset}ms)")
         return True
     except requests.exceptions.RequestException as e:
         log.error(f"Failed to download video: {e}")
@@ -378,6 +425,246 @@ def get_alarm_camera_state(cam_id):
         return 0
 
 
+# ============================================================================
+# BOT COMMANDS
+# ============================================================================
+
+
+def find_camera(name):
+    """Find a camera ID by its ID or Surveillance Station name
+
+    Args:
+        name (str): Camera ID or SynoName (case-insensitive)
+
+    Returns:
+        str: Camera ID, or None if no camera matches
+    """
+    if name in arr_cam_move:
+        return name
+    for cam_id in arr_cam_move:
+        if cam_load[cam_id]["SynoName"].lower() == name.lower():
+            return cam_id
+    return None
+
+
+def send_cached_entry(entry):
+    """Send a cached clip, preferring its Telegram file_id over a re-upload
+
+    Args:
+        entry (dict): Cache entry from clip_cache
+
+    Returns:
+        bool: True if the clip was sent, False otherwise
+    """
+    cam_id = entry["cam_id"]
+    if entry.get("file_id") and resend_camvideo(entry["file_id"], cam_id):
+        return True
+    if not os.path.isfile(entry["file"]):
+        return False
+    file_id = send_camvideo(entry["file"], cam_id)
+    if file_id:
+        clip_cache.set_file_id(cam_id, entry["recording_id"], entry["offset"], file_id)
+    return file_id is not None
+
+
+def send_clip(cam_id, video_id, offset):
+    """Send a clip from the cache, downloading it from Synology on a miss
+
+    Args:
+        cam_id (str): Camera ID from configuration
+        video_id (str): Video ID from Synology
+        offset (int): Offset in milliseconds inside the recording
+
+    Returns:
+        bool: True if the clip was sent, False otherwise
+    """
+    entry = clip_cache.get(cam_id, video_id, offset)
+    if entry and send_cached_entry(entry):
+        log.debug(f"Clip served from cache for camera {cam_id}")
+        return True
+
+    with job_video_file(VIDEO_FILE) as video_file:
+        if not get_last_video(video_id, str(offset), video_file):
+            return False
+        file_id = send_camvideo(video_file, cam_id)
+        clip_cache.put(cam_id, video_id, offset, video_file, file_id)
+    return file_id is not None
+
+
+@tg_bot.message_handler(commands=["last"])
+def command_last(message):
+    """Handle /last <camera> - send the most recent clip of a camera"""
+    if str(message.chat.id) != str(chat_id):
+        return
+    args = message.text.split()[1:]
+    if len(args) != 1:
+        send_cammessage("Usage: /last <camera>")
+        return
+    cam_id = find_camera(args[0])
+    if cam_id is None:
+        send_cammessage(f"Unknown camera: {args[0]}")
+        return
+
+    # Every sent webhook clip is cached, so only ask Synology on a miss
+    latest = clip_cache.latest(cam_id)
+    if latest and send_cached_entry(latest):
+        return
+    last_video_id = get_last_id_video(cam_id)
+    if last_video_id is None:
+        send_cammessage(f"No clip available for camera {args[0]}")
+        return
+
+    # Continue from the newest tracked segment, otherwise send the start
+    # of the recording with the pre-recording
+    offset = 0
+    if str(last_video_id) == str(arr_cam_move[cam_id]["old_last_video_id"]):
+        offset = arr_cam_move[cam_id]["video_offset"]
+    if not send_clip(cam_id, last_video_id, offset):
+        send_cammessage(f"No clip available for camera {args[0]}")
+
+
+@tg_bot.message_handler(commands=["clip"])
+def command_clip(message):
+    """Handle /clip <camera> <minutes-ago> - send the clip recorded at that time"""
+    if str(message.chat.id) != str(chat_id):
+        return
+    args = message.text.split()[1:]
+    if len(args) != 2 or not args[1].isdigit():
+        send_cammessage("Usage: /clip <camera> <minutes-ago>")
+        return
+    cam_id = find_camera(args[0])
+    if cam_id is None:
+        send_cammessage(f"Unknown camera: {args[0]}")
+        return
+
+    recording = get_recording_at(cam_id, int(time.time()) - int(args[1]) * 60)
+    if recording is None or not send_clip(cam_id, *recording):
+        send_cammessage(
+            f"No clip available for camera {args[0]} {args[1]} minute(s) ago"
+        )
+
+
+def start_bot_polling():
+    """Start polling Telegram for bot commands in a background thread
+
+    Only one gunicorn worker may poll a bot token at a time, so the worker
+    that takes the lock file in the clip cache directory does the polling.
+
+    Returns:
+        None
+    """
+    global bot_polling_lock
+    lock = open(os.path.join(CLIP_CACHE_DIR, ".bot_polling.lock"), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        log.debug("Bot commands are polled by another worker")
+        return
+    bot_polling_lock = lock
+    threading.Thread(target=tg_bot.infinity_polling, daemon=True).start()
+    log.info("Listening for bot commands: /last, /clip")
+
+
+if BOT_COMMANDS:
+    start_bot_polling()
+
+
+# ============================================================================
+# HEALTH PROBES
+# ============================================================================
+
+
+def probe_synology():
+    """Check that Synology answers API requests
+
+    Returns:
+        str: Probe detail
+
+    Raises:
+        Exception: If Synology is unreachable
+    """
+    response = requests.get(
+        syno_url,
+        params={"api": "SYNO.API.Info", "version": "1", "method": "query"},
+        timeout=HEALTH_PROBE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return f"HTTP {response.status_code}"
+
+
+def probe_synology_sid():
+    """Check that the Synology session ID is still accepted
+
+    Returns:
+        str: Probe detail
+
+    Raises:
+        Exception: If the session ID is rejected or Synology is unreachable
+    """
+    response = requests.get(
+        syno_url,
+        params={
+            "api": "SYNO.SurveillanceStation.Camera",
+            "version": "9",
+            "method": "List",
+            "limit": "1",
+            "_sid": syno_sid,
+        },
+        timeout=HEALTH_PROBE_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if not data.get("success"):
+        raise RuntimeError(f'SID rejected: {data.get("error", "Unknown error")}')
+    return "valid"
+
+
+def probe_telegram():
+    """Check that the Telegram bot token works with getMe
+
+    Returns:
+        str: Probe detail
+
+    Raises:
+        Exception: If Telegram is unreachable or the token is rejected
+    """
+    # Call getMe directly so the probe honours HEALTH_PROBE_TIMEOUT
+    try:
+        response = requests.get(
+            telebot.apihelper.API_URL.format(token, "getMe"),
+            timeout=HEALTH_PROBE_TIMEOUT,
+        )
+    except requests.exceptions.RequestException as e:
+        # Exception messages contain the URL, which holds the bot token
+        raise RuntimeError(f"getMe failed: {type(e).__name__}") from None
+
+    # Telegram explains errors such as a revoked token (HTTP 401) in the body
+    try:
+        data = response.json()
+    except ValueError:
+        raise RuntimeError(f"getMe failed: HTTP {response.status_code}") from None
+    if not data.get("ok"):
+        raise RuntimeError(
+            f"getMe rejected (HTTP {response.status_code}): "
+            f'{data.get("description", "Unknown error")}'
+        )
+    return f"@{data['result']['username']}"
+
+
+health_prober = HealthProber(
+    {
+        "synology": probe_synology,
+        "synology_sid": probe_synology_sid,
+        "telegram": probe_telegram,
+    },
+    interval=HEALTH_PROBE_INTERVAL,
+    timeout=HEALTH_PROBE_TIMEOUT,
+    max_age=HEALTH_PROBE_INTERVAL * 2 + HEALTH_PROBE_TIMEOUT,
+)
+health_prober.start()
+
+
 app = Flask(__name__)
 
 
@@ -424,21 +711,23 @@ def webhookcam():
                 log.error(f"Failed to get video for camera {cam_id}")
                 abort(500)
 
-            # Check if this is a new motion event
-            if last_video_id != arr_cam_move[cam_id]["old_last_video_id"]:
-                # New motion - start from beginning with pre-recording
-                get_last_video(last_video_id, "0")
-                mycaption = f"🔴 Motion detected: {cam_load[cam_id]['SynoName']}"
-                send_cammessage(mycaption)
-                arr_cam_move[cam_id]["old_last_video_id"] = last_video_id
-                arr_cam_move[cam_id]["video_offset"] = 0
-            else:
-                # Continuous motion - get next segment
-                arr_cam_move[cam_id]["video_offset"] += VIDEO_SEGMENT_DURATION
-                get_last_video(last_video_id, str(arr_cam_move[cam_id]["video_offset"]))
-
-            # Send video to Telegram
-            send_camvideo(VIDEO_FILE, cam_id)
+            # New motion starts from the beginning with pre-recording,
+            # continuous motion gets the next segment
+            offset, new_motion = next_segment(
+                arr_cam_move, cam_id, last_video_id, VIDEO_SEGMENT_DURATION
+            )
+            with job_video_file(VIDEO_FILE) as video_file:
+                downloaded = get_last_video(last_video_id, str(offset), video_file)
+                if new_motion:
+                    mycaption = f"🔴 Motion detected: {cam_load[cam_id]['SynoName']}"
+                    send_cammessage(mycaption)
+
+                # Send video to Telegram and keep it for bot commands
+                if downloaded:
+                    file_id = send_camvideo(video_file, cam_id)
+                    clip_cache.put(cam_id, last_video_id, offset, video_file, file_id)
+                else:
+                    log.error(f"No video to send for camera {cam_id}")
 
             log.debug(f"Webhook processed successfully for camera {cam_id}")
             return "success", 200
@@ -463,6 +752,34 @@ def health():
     }, 200
 
 
+@app.route("/livez", methods=["GET"])
+def livez():
+    """Liveness probe - the app serves requests and the prober is running
+
+    Returns:
+        tuple: Status information and 200, or 503 if the prober has stopped
+    """
+    if not health_prober.is_alive():
+        return {"status": "dead", "detail": "health prober is not running"}, 503
+    return {"status": "alive"}, 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness probe - cached Synology, SID and Telegram check results
+
+    Never calls upstream services; results come from the background prober.
+
+    Returns:
+        tuple: Status information and 200 if ready, 503 otherwise
+    """
+    ready, checks = health_prober.status()
+    return {
+        "status": "ready" if ready else "unready",
+        "checks": checks,
+    }, (200 if ready else 503)
+
+
 # ============================================================================
 # APPLICATION STARTUP
 # ============================================================================
@@ -472,36 +789,12 @@ if __name__ == "__main__":
     log.info("Starting Synology Surveillance Station to Telegram Bridge")
     log.info("=" * 70)
 
-    # Initialize configuration
-    if not pathlib.Path(config_file).is_file():
-        log.info(f"Configuration file not found, initializing...")
-        firstStart()
-    elif pathlib.Path(config_file).stat().st_size == 0:
-        log.info(f"Configuration file is empty, initializing...")
-        firstStart()
-    else:
-        log.info(f"Loading configuration from {config_file}")
-        try:
-            with open(config_file) as f:
-                cam_load = json.load(f)
-            syno_sid = cam_load.get("SynologyAuthSid")
-            if not syno_sid:
-                log.warning("SynologyAuthSid not found in config, reinitializing...")
-                firstStart()
-            else:
-                log.info(f"Loaded configuration with {len(cam_load) - 1} camera(s)")
-        except (IOError, json.JSONDecodeError) as e:
-            log.error(f"Failed to load configuration: {e}")
-            firstStart()
-
-    # Initialize camera tracking
-    for cam_id in cam_load:
-        if cam_id != "SynologyAuthSid":
-            arr_cam_move[cam_id] = {"old_last_video_id": "0", "video_offset": "0"}
-
+    # Configuration and camera tracking are loaded on import above
     log.info(f"Tracking {len(arr_cam_move)} camera(s)")
     log.info(f"Webhook URL: http://<your-host>:7878/webhookcam")
     log.info(f"Health check: http://<your-host>:7878/health")
+    log.info(f"Liveness probe: http://<your-host>:7878/livez")
+    log.info(f"Readiness probe: http://<your-host>:7878/readyz")
     log.info("=" * 70)
 
     # Start Flask app
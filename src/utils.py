@@ -4,6 +4,9 @@ Utility functions for Synology Surveillance Station to Telegram bridge
 This module contains helper functions used throughout the application.
 """
 
+import os
+import contextlib
+import tempfile
 import subprocess
 import sys
 import logging
@@ -45,3 +48,52 @@ def ensure_module_installed(module_name, package_name=None):
         except subprocess.CalledProcessError as e:
             logger.error(f"Failed to install {package}: {e}")
             sys.exit(1)
+
+
+def validate_required_env(required_vars, log):
+    """Validate that all required environment variables are set
+
+    Args:
+        required_vars (list): Names of the required environment variables
+        log (logging.Logger): Logger of the calling application
+
+    Raises:
+        SystemExit: If any variable is missing
+    """
+    missing = []
+    for var_name in required_vars:
+        if var_name not in os.environ:
+            missing.append(var_name)
+
+    if missing:
+        for var in missing:
+            log.error(f"{var} does not exist. Please configure environment")
+        sys.exit(1)
+
+    log.info(f"All required environment variables are set")
+
+
+@contextlib.contextmanager
+def job_video_file(base_file):
+    """Create a temporary video file for one job and remove it afterwards
+
+    Webhooks in other workers and concurrent bot commands each get their own
+    file, so a clip can never be overwritten while it is sent or cached.
+
+    Args:
+        base_file (str): Configured video file; the temporary file is created
+                         in the same folder with the same name prefix
+
+    Yields:
+        str: Path to the temporary video file
+    """
+    prefix = os.path.splitext(os.path.basename(base_file))[0] + "_"
+    fd, video_file = tempfile.mkstemp(
+        suffix=".mp4", prefix=prefix, dir=os.path.dirname(base_file) or None
+    )
+    os.close(fd)
+    try:
+        yield video_file
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(video_file)